@@ -62,7 +62,7 @@ def main():
         """)
     
     # Main content area - Tabs for different functionalities
-    if st.session_state.connection:
+    if st.session_state.app.connection:
         # Create tabs for different views
         tab1, tab2, tab3, tab4, tab5 = st.tabs([
             "Explorer", 
@@ -107,19 +107,34 @@ def render_settings():
         "Rows per page in preview:",
         min_value=10,
         max_value=500,
-        value=st.session_state.preferences['rows_per_page'],
+        value=st.session_state.app.rows_per_page,
         step=10
     )
     
-    if rows_per_page != st.session_state.preferences['rows_per_page']:
+    if rows_per_page != st.session_state.app.rows_per_page:
         from session_manager import update_preference
         update_preference('rows_per_page', rows_per_page)
         st.success("Settings updated!")
     
+    # Row limit for SQL Editor SELECTs without their own LIMIT
+    query_row_limit = st.number_input(
+        "Max rows per SQL Editor result:",
+        min_value=10,
+        max_value=100000,
+        value=st.session_state.app.query_row_limit,
+        step=100,
+        help="SELECT queries without a LIMIT clause are capped at this many rows per page."
+    )
+    
+    if query_row_limit != st.session_state.app.query_row_limit:
+        from session_manager import update_preference
+        update_preference('query_row_limit', query_row_limit)
+        st.success("Settings updated!")
+    
     # Clear history button
     st.subheader("Data Management")
     if st.button("Clear Query History", type="secondary"):
-        st.session_state.query_history = []
+        st.session_state.app.query_history.clear()
         st.success("Query history cleared!")
     
     # App info
@@ -193,6 +208,8 @@ def create_sample_database():
         
         # Create sample database
         conn = sqlite3.connect(tmp_path)
+        # Page size can only be set while the database is still empty
+        conn.execute("PRAGMA page_size = 65536")
         cursor = conn.cursor()
         
         # Create sample tables
@@ -240,22 +257,9 @@ def create_sample_database():
         conn.commit()
         conn.close()
         
-        # Load this database into the app
-        with open(tmp_path, 'rb') as f:
-            # Simulate file upload
-            import io
-            from modules.file_uploader import handle_uploaded_file
-            
-            class MockUploadedFile:
-                def __init__(self, path):
-                    with open(path, 'rb') as file:
-                        self.value = file.read()
-                
-                def getvalue(self):
-                    return self.value
-            
-            mock_file = MockUploadedFile(tmp_path)
-            handle_uploaded_file(mock_file)
+        # Load this database into the app (it's already on disk, so no upload round-trip)
+        from modules.file_uploader import load_database_from_path
+        load_database_from_path(tmp_path)
         
         st.success("Sample database created and loaded!")
         st.rerun()
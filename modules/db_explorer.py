@@ -3,9 +3,57 @@
 Module for exploring database structure and viewing table data.
 """
 
+from collections import Counter
 import streamlit as st
 import pandas as pd
-from utils.database import get_table_preview, get_table_schema
+from utils.database import (
+    get_table_page, cached_table_schema, get_row_count, get_row_count_estimate,
+    get_db_mtime, get_read_pool, write_connection, SCHEMA_COLUMNS
+)
+
+# Max number of page cursors remembered per table
+MAX_PAGE_CURSORS = 256
+
+# Above this many tables, only the selectbox is shown
+MAX_LISTED_TABLES = 200
+
+# Cached query helpers - Streamlit reruns the whole script on every widget
+# click, so without these the same queries hit SQLite again and again.
+# They take the same cache key arguments as cached_table_list in utils/database.py.
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _cached_page(_conn, db_path: str, mtime: float, table_name: str, after, limit: int):
+    """
+    Cached version of get_table_page.
+    """
+    return get_table_page(_conn, table_name, after=after, limit=limit)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _type_chart_data(type_counts: tuple) -> pd.DataFrame:
+    """
+    Build the column-type chart data once per distinct set of counts.
+    
+    Args:
+        type_counts (tuple): (type, count) pairs
+    """
+    return pd.DataFrame(list(type_counts), columns=["type", "count"]).set_index("type")
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _cached_row_count(_conn, db_path: str, mtime: float, table_name: str) -> int:
+    """
+    Cached exact row count for a table.
+    """
+    return get_row_count(_conn, table_name)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _cached_row_count_estimate(db_path: str, mtime: float, table_name: str) -> int:
+    """
+    Cached approximate row count for a table.
+    For WITHOUT ROWID tables the estimate may run ANALYZE, which writes,
+    so it opens a write connection (only when the result isn't cached yet).
+    """
+    with write_connection(db_path) as conn:
+        return get_row_count_estimate(conn, table_name)
 
 def render_database_explorer():
     """
@@ -13,7 +61,7 @@ def render_database_explorer():
     """
     st.header("Database Explorer")
     
-    if not st.session_state.connection:
+    if not st.session_state.app.connection:
         st.info("Please upload a database file to start exploring.")
         return
     
@@ -24,7 +72,7 @@ def render_database_explorer():
         render_table_list()
     
     with col_right:
-        if st.session_state.selected_table:
+        if st.session_state.app.selected_table:
             render_table_details()
 
 def render_table_list():
@@ -33,39 +81,48 @@ def render_table_list():
     """
     st.subheader("Tables")
     
-    if not st.session_state.tables:
+    if not st.session_state.app.tables:
         st.info("No tables found in the database.")
         return
     
     # Create a selectbox for table selection
     selected_table = st.selectbox(
         "Select a table:",
-        st.session_state.tables,
+        st.session_state.app.tables,
         key="table_selectbox"
     )
     
     # Update session state if selection changed
-    if selected_table != st.session_state.selected_table:
-        st.session_state.selected_table = selected_table
+    if selected_table != st.session_state.app.selected_table:
+        st.session_state.app.selected_table = selected_table
         # No need to rerun - Streamlit will handle the update
     
-    # Display table list with counts
+    # With lots of tables the list is just noise - the selectbox is searchable
+    if len(st.session_state.app.tables) > MAX_LISTED_TABLES:
+        st.caption(f"{len(st.session_state.app.tables)} tables - use the selectbox to search them.")
+        return
+    
+    # Display table list in a single Markdown element (one per table is slow)
+    lines = [
+        f"**{table}**" if table == st.session_state.app.selected_table else f"• {table}"
+        for table in st.session_state.app.tables
+    ]
     st.write("**All tables:**")
-    for table in st.session_state.tables:
-        # Highlight selected table
-        if table == st.session_state.selected_table:
-            st.write(f"**{table}**")
-        else:
-            st.write(f"• {table}")
+    st.markdown("\n\n".join(lines))
 
 def render_table_details():
     """
     Render details for the selected table.
     """
-    if not st.session_state.selected_table:
+    if not st.session_state.app.selected_table:
         return
     
-    table_name = st.session_state.selected_table
+    table_name = st.session_state.app.selected_table
+    
+    # Only query tables that actually exist in the database
+    if table_name not in st.session_state.app.tables:
+        st.error(f"Unknown table: '{table_name}'")
+        return
     
     # Create tabs for different views of the table
     tab1, tab2, tab3 = st.tabs(["Data Preview", "🔧 Schema", "📈 Statistics"])
@@ -88,17 +145,27 @@ def render_data_preview(table_name: str):
     """
     st.subheader(f"Data: {table_name}")
     
+    page_size = st.session_state.app.rows_per_page
+    
+    page = st.number_input(
+        "Page:",
+        min_value=1,
+        value=1,
+        step=1,
+        key=f"preview_page_{table_name}"
+    )
+    
     try:
-        # Get data preview
-        df = get_table_preview(
-            st.session_state.connection, 
-            table_name, 
-            limit=st.session_state.preferences['rows_per_page']
-        )
+        # Get the requested page
+        df = get_preview_page(table_name, int(page), page_size)
         
-        # Display row count info
-        total_rows = len(df)
-        st.write(f"Showing first **{total_rows}** rows")
+        if df is None or df.empty:
+            st.info("No rows on this page.")
+            return
+        
+        # Display row range info
+        first_row = (page - 1) * page_size + 1
+        st.write(f"Showing rows **{first_row}** to **{first_row + len(df) - 1}**")
         
         # Display the dataframe
         st.dataframe(df, use_container_width=True)
@@ -106,6 +173,51 @@ def render_data_preview(table_name: str):
     except Exception as e:
         st.error(f"Error loading table data: {str(e)}")
 
+def get_preview_page(table_name: str, page: int, page_size: int):
+    """
+    Get a page of table data using keyset pagination.
+    
+    The last key of every page we've seen is remembered in session state
+    (page -> key), so moving to the next or previous page is one cheap
+    seek. Jumping ahead walks forward from the nearest known page.
+    
+    Args:
+        table_name (str): Name of the table
+        page (int): Page number, starting at 1
+        page_size (int): Rows per page
+        
+    Returns:
+        pd.DataFrame: Page data, or None if the page is past the end of the table
+    """
+    db_path = st.session_state.app.db_path
+    mtime = get_db_mtime(db_path)
+    
+    # Cursors are only valid for one page size, so key them on it
+    cursor_key = (db_path, table_name, page_size)
+    cursors = st.session_state.app.preview_cursors.setdefault(cursor_key, {1: None})
+    
+    # Start at the closest page we already have a cursor for
+    current = max(p for p in cursors if p <= page)
+    after = cursors[current]
+    
+    with get_read_pool(db_path).acquire() as conn:
+        while True:
+            df, last_key = _cached_page(conn, db_path, mtime, table_name, after, page_size)
+            if current == page:
+                return df
+            if last_key is None:
+                # Ran off the end of the table
+                return None
+            
+            current += 1
+            after = last_key
+            cursors[current] = after
+            
+            # Drop the oldest cursors so this doesn't grow forever (keep page 1)
+            while len(cursors) > MAX_PAGE_CURSORS:
+                oldest = next(p for p in cursors if p != 1)
+                del cursors[oldest]
+
 def render_table_schema(table_name: str):
     """
     Render table schema information.
@@ -117,23 +229,27 @@ def render_table_schema(table_name: str):
     
     try:
         # Get schema information
-        schema_df = get_table_schema(st.session_state.connection, table_name)
+        db_path = st.session_state.app.db_path
+        with get_read_pool(db_path).acquire() as conn:
+            schema_rows = cached_table_schema(conn, db_path, get_db_mtime(db_path), table_name)
         
-        if schema_df.empty:
+        if not schema_rows:
             st.info(f"No schema information available for table '{table_name}'")
             return
         
         # Display schema in a nice format
-        st.dataframe(schema_df, use_container_width=True)
+        st.dataframe(pd.DataFrame(schema_rows, columns=SCHEMA_COLUMNS), use_container_width=True)
         
         # Show CREATE TABLE statement in expander
         with st.expander("View CREATE TABLE Statement"):
             try:
-                create_query = f"SELECT sql FROM sqlite_master WHERE name='{table_name}'"
-                create_stmt = pd.read_sql_query(create_query, st.session_state.connection)
+                # Bind the name as a parameter so the statement text never changes
+                row = st.session_state.app.connection.execute(
+                    "SELECT sql FROM sqlite_master WHERE name = ?", (table_name,)
+                ).fetchone()
                 
-                if not create_stmt.empty and create_stmt.iloc[0, 0]:
-                    st.code(create_stmt.iloc[0, 0], language="sql")
+                if row and row[0]:
+                    st.code(row[0], language="sql")
                 else:
                     st.info("CREATE TABLE statement not available")
             except:
@@ -152,26 +268,43 @@ def render_table_statistics(table_name: str):
     st.subheader(f"Statistics: {table_name}")
     
     try:
-        # Get basic stats
-        query = f"SELECT COUNT(*) as row_count FROM {table_name}"
-        count_df = pd.read_sql_query(query, st.session_state.connection)
+        db_path = st.session_state.app.db_path
+        mtime = get_db_mtime(db_path)
+        
+        # Exact counts scan the whole table, so only run them on request
+        exact_count = st.toggle(
+            "Exact count",
+            key=f"exact_count_{table_name}",
+            help="Run a full COUNT(*) instead of the fast estimate. This can be slow on large tables."
+        )
         
         # Create metrics
         col1, col2 = st.columns(2)
         
         with col1:
-            st.metric("Total Rows", count_df.iloc[0, 0])
+            if exact_count:
+                with get_read_pool(db_path).acquire() as conn:
+                    row_count = _cached_row_count(conn, db_path, mtime, table_name)
+                st.metric("Total Rows", f"{row_count:,}")
+            else:
+                row_count = _cached_row_count_estimate(db_path, mtime, table_name)
+                st.metric("Total Rows", f"~{row_count:,}")
         
         with col2:
             # Try to get column count
-            schema_df = get_table_schema(st.session_state.connection, table_name)
-            st.metric("Columns", len(schema_df))
+            with get_read_pool(db_path).acquire() as conn:
+                schema_rows = cached_table_schema(conn, db_path, mtime, table_name)
+            st.metric("Columns", len(schema_rows))
         
         # Show data types distribution
         st.write("**Column Types:**")
-        if not schema_df.empty:
-            type_counts = schema_df['type'].value_counts()
-            st.bar_chart(type_counts)
+        type_counts = Counter(row[2] for row in schema_rows)
+        if len(type_counts) == 1:
+            # A chart with a single bar doesn't tell us anything
+            only_type = next(iter(type_counts)) or "(no type)"
+            st.caption(f"All columns are {only_type}")
+        elif type_counts:
+            st.bar_chart(_type_chart_data(tuple(type_counts.most_common())))
         
     except Exception as e:
         st.error(f"Error loading statistics: {str(e)}")
\ No newline at end of file
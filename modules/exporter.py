@@ -4,9 +4,24 @@ Module for exporting data from the database.
 """
 
 import streamlit as st
-import pandas as pd
 import os
-from utils.database import execute_query
+import shutil
+import sqlite3
+from functools import partial
+from utils.database import execute_query, create_database_snapshot, get_read_pool, quote_identifier
+
+# Format name -> (MIME type, file extension)
+EXPORT_FORMATS = {
+    "CSV": ("text/csv", "csv"),
+    "JSON": ("application/json", "json"),
+    "Excel": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+# Rows fetched from SQLite per chunk when exporting
+EXPORT_CHUNK_SIZE = 10_000
+
+# Data rows that fit on an Excel sheet (1,048,576 minus the header row)
+EXCEL_MAX_ROWS = 1_048_575
 
 def render_exporter():
     """
@@ -14,7 +29,7 @@ def render_exporter():
     """
     st.header("Export Data")
     
-    if not st.session_state.connection:
+    if not st.session_state.app.connection:
         st.info("Please upload a database file to export data.")
         return
     
@@ -36,14 +51,14 @@ def render_table_export():
     """
     st.subheader("Export Table")
     
-    if not st.session_state.tables:
+    if not st.session_state.app.tables:
         st.info("No tables available for export.")
         return
     
     # Table selection
     table_name = st.selectbox(
         "Select table to export:",
-        st.session_state.tables,
+        st.session_state.app.tables,
         key="export_table_select"
     )
     
@@ -70,46 +85,13 @@ def export_table_data(table_name: str, format: str):
         format (str): Export format (CSV, JSON, Excel)
     """
     try:
-        # Get all data from table
-        query = f"SELECT * FROM {table_name}"
-        df = execute_query(st.session_state.connection, query)
-        
-        if df.empty:
-            st.warning("Table is empty.")
-            return
-        
-        # Convert to requested format
-        if format == "CSV":
-            data = df.to_csv(index=False)
-            mime_type = "text/csv"
-            file_extension = "csv"
-        elif format == "JSON":
-            data = df.to_json(orient="records", indent=2)
-            mime_type = "application/json"
-            file_extension = "json"
-        elif format == "Excel":
-            data = df.to_excel(index=False)
-            mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            file_extension = "xlsx"
-        else:
-            st.error("Unsupported format")
-            return
-        
-        # Create download button
-        st.download_button(
-            label=f"Download {table_name}.{file_extension}",
-            data=data,
-            file_name=f"{table_name}.{file_extension}",
-            mime=mime_type
-        )
-        
-        # Show preview
-        st.success(f"Ready to export {len(df)} rows from '{table_name}'")
-        with st.expander("Preview data"):
-            st.dataframe(df.head(10), use_container_width=True)
-            
-    except Exception as e:
+        # Only allow tables that actually exist in the database
+        query = f"SELECT * FROM {quote_identifier(table_name, st.session_state.app.tables)}"
+    except ValueError as e:
         st.error(f"Export error: {str(e)}")
+        return
+    
+    render_export_download(query, format, table_name, empty_message="Table is empty.")
 
 def render_query_export():
     """
@@ -149,46 +131,313 @@ def export_query_results(query: str, format: str):
         query (str): SQL query to execute
         format (str): Export format
     """
+    render_export_download(query, format, "query_results", empty_message="Query returned no results.")
+
+def render_export_download(query: str, format: str, base_name: str, empty_message: str):
+    """
+    Run an export query and render a download button for the result.
+    
+    Args:
+        query (str): SQL query whose results are exported
+        format (str): Export format (CSV, JSON, Excel)
+        base_name (str): File name without extension
+        empty_message (str): Warning shown when the query returns no rows
+    """
+    if format not in EXPORT_FORMATS:
+        st.error("Unsupported format")
+        return
+    
+    mime_type, file_extension = EXPORT_FORMATS[format]
+    tmp_path = None
+    
     try:
-        # Execute query
-        df = execute_query(st.session_state.connection, query)
+        # Write the export to a temp file chunk by chunk instead of
+        # building the whole table and output string in memory
+        tmp_path, row_count, preview_df = write_export_file(query, format)
         
-        if df.empty:
-            st.warning("Query returned no results.")
+        if row_count == 0:
+            st.warning(empty_message)
             return
         
-        # Convert to requested format
-        if format == "CSV":
-            data = df.to_csv(index=False)
-            mime_type = "text/csv"
-            file_extension = "csv"
-        elif format == "JSON":
-            data = df.to_json(orient="records", indent=2)
-            mime_type = "application/json"
-            file_extension = "json"
-        elif format == "Excel":
-            data = df.to_excel(index=False)
-            mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            file_extension = "xlsx"
-        else:
-            st.error("Unsupported format")
-            return
+        # Keep the file for the download button (replaces the last one)
+        set_download_file(tmp_path)
+        download_path, tmp_path = tmp_path, None
         
-        # Create download button
+        # Create download button - the file is only read once it's clicked
         st.download_button(
-            label=f"Download query_results.{file_extension}",
-            data=data,
-            file_name=f"query_results.{file_extension}",
-            mime=mime_type
+            label=f"Download {base_name}.{file_extension}",
+            data=partial(read_download_file, download_path),
+            file_name=f"{base_name}.{file_extension}",
+            mime=mime_type,
+            on_click="ignore"
         )
         
         # Show preview
-        st.success(f"Ready to export {len(df)} rows")
-        with st.expander("Preview results"):
-            st.dataframe(df.head(10), use_container_width=True)
+        st.success(f"Ready to export {row_count} rows")
+        with st.expander("Preview data"):
+            st.dataframe(preview_df, use_container_width=True)
             
     except Exception as e:
         st.error(f"Export error: {str(e)}")
+    finally:
+        # Only left set if the export failed before reaching the button
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def set_download_file(path: str):
+    """
+    Remember the temp file or folder behind the current download button.
+    
+    The download button reads the file only when it's clicked, so the
+    file has to outlive this script run. One per session is kept: the
+    previous one is deleted here, and the last one by clear_database_state.
+    
+    Args:
+        path (str): Temp file (or folder holding it) to delete later
+    """
+    discard_download_file()
+    st.session_state.app.download_file = path
+
+def discard_download_file():
+    """
+    Delete the temp file or folder behind the current download button, if any.
+    """
+    path = st.session_state.app.download_file
+    if path:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+    st.session_state.app.download_file = None
+
+def read_download_file(path: str) -> bytes:
+    """
+    Read a prepared export for the download button.
+    Passed to st.download_button as a callable, so the file is only read
+    into memory when the user actually clicks Download, not on every run.
+    
+    Args:
+        path (str): File to read
+        
+    Returns:
+        bytes: File contents
+    """
+    with open(path, 'rb') as f:
+        return f.read()
+
+def write_export_file(query: str, format: str):
+    """
+    Write query results to a temporary file in the given format.
+    
+    Rows are written out as soon as they are fetched, so only one chunk
+    is held in memory at a time.
+    
+    Args:
+        query (str): SQL query whose results are exported
+        format (str): Export format (CSV, JSON, Excel)
+        
+    Returns:
+        tuple: (temp file path, number of rows written, first rows for preview)
+    """
+    # Only needed once the user actually exports something
+    import tempfile
+    
+    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{EXPORT_FORMATS[format][1]}") as tmp_file:
+        tmp_path = tmp_file.name
+    
+    row_count = 0
+    preview_df = None
+    
+    # Exports only read, so run them on a pooled read-only connection
+    # rather than tying up the main one
+    with get_read_pool(st.session_state.app.db_path).acquire() as conn:
+        if format == "CSV":
+            chunks = execute_query(conn, query, chunksize=EXPORT_CHUNK_SIZE)
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                for chunk in chunks:
+                    # Only the first chunk writes the header row
+                    chunk.to_csv(f, index=False, header=preview_df is None)
+                    if preview_df is None:
+                        preview_df = chunk.head(10)
+                    row_count += len(chunk)
+        
+        elif format == "JSON":
+            try:
+                row_count, preview_df = write_json_file_with_sqlite(conn, query, tmp_path)
+            except sqlite3.OperationalError:
+                # e.g. BLOB columns (JSON can't hold them), more columns than
+                # json_object() accepts, or SQLite built without JSON support
+                chunks = execute_query(conn, query, chunksize=EXPORT_CHUNK_SIZE)
+                row_count, preview_df = write_json_file(chunks, tmp_path)
+        
+        elif format == "Excel":
+            chunks = execute_query(conn, query, chunksize=EXPORT_CHUNK_SIZE)
+            row_count, preview_df = write_excel_file(chunks, tmp_path)
+    
+    return tmp_path, row_count, preview_df
+
+def write_json_file_with_sqlite(conn, query: str, path: str):
+    """
+    Write query results to a JSON file, letting SQLite build the JSON.
+    
+    The query is wrapped so each row comes back as a ready-made
+    json_object() string, built in C inside SQLite. All that's left in
+    Python is joining them with commas, so no DataFrame is created.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        query (str): SQL query whose results are exported
+        path (str): Output file path
+        
+    Returns:
+        tuple: (number of rows written, first rows for preview)
+        
+    Raises:
+        sqlite3.OperationalError: If SQLite can't produce JSON for this query
+    """
+    import json
+    
+    inner = query.strip().rstrip(';')
+    
+    # Get the result column names without fetching any rows
+    cursor = conn.execute(f"SELECT * FROM (\n{inner}\n) LIMIT 0")
+    columns = [d[0] for d in cursor.description]
+    
+    # json_object('col1', "col1", 'col2', "col2", ...)
+    pairs = ", ".join(
+        "'" + col.replace("'", "''") + "', " + quote_identifier(col) for col in columns
+    )
+    cursor = conn.cursor()
+    cursor.arraysize = EXPORT_CHUNK_SIZE
+    cursor.execute(f"SELECT json_object({pairs}) FROM (\n{inner}\n)")
+    
+    row_count = 0
+    preview_rows = []
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            if row_count > 0:
+                f.write(",")
+            f.write(",".join(row[0] for row in rows))
+            
+            if len(preview_rows) < 10:
+                preview_rows.extend(json.loads(row[0]) for row in rows[:10 - len(preview_rows)])
+            row_count += len(rows)
+        f.write("]")
+    
+    # Imported here since it's only needed for the preview
+    import pandas as pd
+    preview_df = pd.DataFrame.from_records(preview_rows, columns=columns)
+    
+    return row_count, preview_df
+
+def write_json_file(chunks, path: str):
+    """
+    Write chunks of query results to a JSON file using pandas.
+    BLOB values are written as hex strings, like the Excel export does.
+    
+    Args:
+        chunks: Iterable of DataFrames to write
+        path (str): Output file path
+        
+    Returns:
+        tuple: (number of rows written, first rows for preview)
+    """
+    row_count = 0
+    preview_df = None
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            # Each chunk is a JSON array - strip its brackets and join with commas
+            if row_count > 0:
+                f.write(",")
+            f.write(_blobs_to_hex(chunk).to_json(orient="records")[1:-1])
+            if preview_df is None:
+                preview_df = chunk.head(10)
+            row_count += len(chunk)
+        f.write("]")
+    
+    return row_count, preview_df
+
+def _blobs_to_hex(chunk):
+    """
+    Replace bytes values with hex strings, since JSON has no binary type
+    (to_json fails on bytes that aren't valid UTF-8).
+    Only columns that can hold bytes (BLOB or mixed-type ones) are scanned.
+    
+    Args:
+        chunk (pd.DataFrame): Chunk of query results
+        
+    Returns:
+        pd.DataFrame: The chunk, with a copy made only if something changed
+    """
+    import pandas as pd
+    import pyarrow as pa
+    
+    converted = None
+    for col in chunk.columns:
+        dtype = chunk[col].dtype
+        if dtype == object or (isinstance(dtype, pd.ArrowDtype) and pa.types.is_binary(dtype.pyarrow_dtype)):
+            if converted is None:
+                converted = chunk.copy()
+            converted[col] = chunk[col].map(lambda v: v.hex() if isinstance(v, bytes) else v)
+    return chunk if converted is None else converted
+
+def write_excel_file(chunks, path: str):
+    """
+    Write chunks of query results to an Excel file.
+    
+    Uses xlsxwriter's constant_memory mode, which flushes each row to disk
+    as soon as the next one starts, so memory use stays flat. That mode
+    needs rows written strictly in order, which pandas' to_excel doesn't do,
+    so the rows are written directly with write_row. BLOB values are
+    written as hex strings.
+    
+    Args:
+        chunks: Iterable of DataFrames to write
+        path (str): Output file path
+        
+    Returns:
+        tuple: (number of rows written, first rows for preview)
+    """
+    # Imported here so the Excel writer is only loaded when actually used
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise Exception("Excel export requires the xlsxwriter package (pip install xlsxwriter)")
+    
+    row_count = 0
+    preview_df = None
+    
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        worksheet = workbook.add_worksheet()
+        
+        for chunk in chunks:
+            if preview_df is None:
+                preview_df = chunk.head(10)
+                worksheet.write_row(0, 0, [str(col) for col in chunk.columns])
+            
+            if row_count + len(chunk) > EXCEL_MAX_ROWS:
+                raise Exception(f"Excel sheets hold at most {EXCEL_MAX_ROWS:,} rows. Use CSV for larger exports.")
+            
+            # Write missing values as empty cells
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for row in chunk.itertuples(index=False, name=None):
+                row_count += 1
+                # xlsxwriter can't write bytes, so BLOBs are written as hex text
+                worksheet.write_row(row_count, 0, [v.hex() if isinstance(v, bytes) else v for v in row])
+    finally:
+        workbook.close()
+    
+    return row_count, preview_df
 
 def render_database_export():
     """
@@ -196,37 +445,50 @@ def render_database_export():
     """
     st.subheader("Export Entire Database")
     
-    if not st.session_state.db_path or not os.path.exists(st.session_state.db_path):
+    if not st.session_state.app.db_path or not os.path.exists(st.session_state.app.db_path):
         st.info("No database file available for export.")
         return
     
     st.write("Download the entire SQLite database file:")
     
-    # Read database file
+    # Snapshots copy the whole database, so only build one when asked
+    if not st.button("Prepare Database Download", type="primary"):
+        st.caption("Creates a consistent snapshot of the database, including any edits made here.")
+        return
+    
+    snapshot_path = None
     try:
-        with open(st.session_state.db_path, 'rb') as f:
-            db_data = f.read()
+        snapshot_path = create_database_snapshot(st.session_state.app.connection)
         
         # Get filename
-        filename = os.path.basename(st.session_state.db_path)
+        filename = os.path.basename(st.session_state.app.db_path)
         if not filename.endswith('.db'):
             filename = "database.db"
         
-        # Download button
+        # Keep the snapshot's folder until the next download replaces it
+        set_download_file(os.path.dirname(snapshot_path))
+        download_path, snapshot_path = snapshot_path, None
+        
+        # Download button - the file is only read once it's clicked
         st.download_button(
             label="Download Database File",
-            data=db_data,
+            data=partial(read_download_file, download_path),
             file_name=filename,
-            mime="application/x-sqlite3"
+            mime="application/x-sqlite3",
+            on_click="ignore"
         )
         
         # Show database info
         st.info(f"""
         **Database Information:**
-        - File size: {len(db_data) / 1024:.1f} KB
-        - Tables: {len(st.session_state.tables)}
-        - This will download the exact database file you uploaded
+        - File size: {os.path.getsize(download_path) / 1024:.1f} KB
+        - Tables: {len(st.session_state.app.tables)}
+        - This is a clean snapshot of the database, including any edits made here
         """)
         
     except Exception as e:
-        st.error(f"Error reading database file: {str(e)}")
\ No newline at end of file
+        st.error(f"Error creating database snapshot: {str(e)}")
+    finally:
+        # Only left set if something failed before reaching the button
+        if snapshot_path:
+            shutil.rmtree(os.path.dirname(snapshot_path), ignore_errors=True)
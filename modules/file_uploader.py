@@ -3,9 +3,11 @@
 Module for handling file uploads and database initialization.
 """
 
+import os
+import hashlib
 import streamlit as st
 import tempfile
-from utils.database import connect_to_database, get_table_list
+from utils.database import get_connection, get_db_mtime, cached_table_list
 
 def render_file_uploader():
     """
@@ -26,6 +28,8 @@ def render_file_uploader():
     if uploaded_file is not None:
         return handle_uploaded_file(uploaded_file)
     
+    # Upload removed - uploading the same file again should load it again
+    st.session_state.app.db_sig = None
     return False
 
 def handle_uploaded_file(uploaded_file):
@@ -38,15 +42,63 @@ def handle_uploaded_file(uploaded_file):
     Returns:
         bool: True if database was loaded successfully
     """
+    # The uploader hands back the same file on every rerun, so skip the
+    # temp-file copy, reconnect and table listing if it's already loaded
+    sig = get_file_signature(uploaded_file)
+    if st.session_state.app.db_sig == sig:
+        return False
+    
     try:
         # Create temporary file to store the uploaded database
         # We need a physical file because SQLite requires file system access
         with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
+            tmp_file.write(uploaded_file.getbuffer())
             tmp_path = tmp_file.name
+            
+    except Exception as e:
+        st.error(f"Error loading database: {str(e)}")
+        return False
+    
+    loaded = load_database_from_path(tmp_path)
+    if loaded:
+        st.session_state.app.db_sig = sig
+    return loaded
+
+def get_file_signature(uploaded_file) -> bytes:
+    """
+    Get a cheap fingerprint of an uploaded database file.
+    
+    Hashes the file size and the first 8 KB, which hold the SQLite header
+    (including its change counter) and the start of the schema. That's
+    enough to tell files apart and takes microseconds, unlike hashing
+    the whole file.
+    
+    Args:
+        uploaded_file: Streamlit UploadedFile object
         
+    Returns:
+        bytes: 16-byte signature
+    """
+    buffer = uploaded_file.getbuffer()
+    digest = hashlib.blake2b(buffer[:8192], digest_size=16)
+    digest.update(str(len(buffer)).encode())
+    return digest.digest()
+
+def load_database_from_path(db_path: str):
+    """
+    Load a database file that is already on disk into the app.
+    Use this instead of handle_uploaded_file when you already have a file,
+    so its bytes aren't read back and written to another temp file.
+    
+    Args:
+        db_path (str): Path to the database file
+        
+    Returns:
+        bool: True if database was loaded successfully
+    """
+    try:
         # Check if this is a new database (different from current)
-        if st.session_state.db_path != tmp_path:
+        if st.session_state.app.db_path != db_path:
             # Import session manager to clear old state
             from session_manager import clear_database_state
             
@@ -54,14 +106,18 @@ def handle_uploaded_file(uploaded_file):
             clear_database_state()
             
             # Connect to new database
-            conn = connect_to_database(tmp_path)
+            conn = get_connection(db_path)
             
             # Update session state
-            st.session_state.connection = conn
-            st.session_state.db_path = tmp_path
-            st.session_state.tables = get_table_list(conn)
+            st.session_state.app.connection = conn
+            st.session_state.app.db_path = db_path
+            st.session_state.app.tables = cached_table_list(conn, db_path, get_db_mtime(db_path))
+            
+            # Worked out once here so the sidebar doesn't redo it on every rerun
+            st.session_state.app.db_filename = os.path.basename(db_path)
+            st.session_state.app.table_count = len(st.session_state.app.tables)
             
-            st.success(f"Database loaded successfully! Found {len(st.session_state.tables)} tables.")
+            st.success(f"Database loaded successfully! Found {st.session_state.app.table_count} tables.")
             return True
             
     except Exception as e:
@@ -74,16 +130,15 @@ def render_database_info():
     """
     Display current database information in the sidebar.
     """
-    if st.session_state.connection:
+    if st.session_state.app.connection:
         st.sidebar.subheader("Current Database")
         
-        # Show file name (extract from path)
-        if st.session_state.db_path:
-            filename = st.session_state.db_path.split('/')[-1]
-            st.sidebar.write(f"**File:** `{filename}`")
+        # Show file name
+        if st.session_state.app.db_filename:
+            st.sidebar.write(f"**File:** `{st.session_state.app.db_filename}`")
         
         # Show table count
-        st.sidebar.metric("Tables", len(st.session_state.tables))
+        st.sidebar.metric("Tables", st.session_state.app.table_count)
         
         # Clear database button
         if st.sidebar.button("Clear Database", type="secondary"):
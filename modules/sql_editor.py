@@ -3,10 +3,46 @@
 Module for SQL query editing and execution.
 """
 
+import re
+import time
+from contextlib import contextmanager
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-import pandas as pd
-from utils.database import execute_query
-from session_manager import add_to_query_history
+from utils.database import (
+    execute_query, connect_to_database, get_first_keyword, is_multi_statement, write_connection
+)
+from session_manager import add_to_query_history, close_result_stream
+
+# Worker threads for running queries off the script thread, so a slow
+# query doesn't freeze the UI. Shared by all sessions in this process.
+_EXEC = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sql_editor")
+
+# How often (in seconds) to check whether a running query has finished
+QUERY_POLL_INTERVAL = 0.1
+
+# SQLite steps between checks for a cancelled query (see watch_for_cancel)
+QUERY_CANCEL_CHECK_STEPS = 10_000
+
+# Example queries shown in the Examples expander
+EXAMPLE_QUERIES = {
+    "Basic Select": "SELECT * FROM users LIMIT 10;",
+    "Count Rows": "SELECT COUNT(*) FROM products;",
+    "Filter Data": "SELECT * FROM orders WHERE status = 'completed';",
+    "Join Tables": """SELECT u.name, o.order_date, o.total
+FROM users u
+JOIN orders o ON u.id = o.user_id;""",
+    "See Schema": "PRAGMA table_info(users);",
+    "List Tables": "SELECT name FROM sqlite_master WHERE type='table';"
+}
+
+# Built once so rendering the examples is a single Markdown element
+EXAMPLE_QUERIES_MARKDOWN = "\n".join(
+    f"**{title}:**\n```sql\n{query}\n```" for title, query in EXAMPLE_QUERIES.items()
+)
+
+# Matches a LIMIT clause at the very end of a query
+_TRAILING_LIMIT_RE = re.compile(r"\bLIMIT\s+[^;()]+;?\s*$", re.IGNORECASE)
 
 def render_sql_editor():
     """
@@ -14,7 +50,7 @@ def render_sql_editor():
     """
     st.header("SQL Editor")
     
-    if not st.session_state.connection:
+    if not st.session_state.app.connection:
         st.info("Please upload a database file to use the SQL editor.")
         return
     
@@ -44,22 +80,34 @@ def render_query_input():
     col1, col2, col3 = st.columns([1, 1, 2])
     
     with col1:
-        if st.button("Run Query", type="primary", use_container_width=True):
-            execute_sql_query(sql_query)
+        run_clicked = st.button("Run Query", type="primary", use_container_width=True)
     
     with col2:
         if st.button("Clear", use_container_width=True):
-            # Clear the text area by rerunning
+            # Clear the results by rerunning
+            close_result_stream()
             st.rerun()
     
     with col3:
         with st.expander("Examples"):
             render_example_queries()
+    
+    # Show results below the controls, full width
+    if run_clicked:
+        execute_sql_query(sql_query)
+    elif st.session_state.app.result_stream is not None:
+        # Keep showing a streamed result, so "Load more" can add to it
+        render_result_stream()
 
 def execute_sql_query(query: str):
     """
     Execute a SQL query and display results.
     
+    SELECTs without their own LIMIT are streamed: only the first chunk of
+    rows (the row limit from Settings) is fetched, and the cursor is kept
+    open so "Load more" can fetch the next chunk. A bare SELECT * on a big
+    table never has to fit in memory all at once.
+    
     Args:
         query (str): SQL query to execute
     """
@@ -67,19 +115,40 @@ def execute_sql_query(query: str):
         st.warning("Please enter a SQL query first.")
         return
     
+    # A new query replaces any result that's still being streamed
+    close_result_stream()
+    
+    # A script is run as a whole, even if it starts with a SELECT
+    is_select = get_first_keyword(query) == 'SELECT' and not is_multi_statement(query)
+    streamed = is_select and not _TRAILING_LIMIT_RE.search(query)
+    
     try:
         # Execute the query
-        result_df = execute_query(st.session_state.connection, query)
+        if streamed:
+            stream = run_query_in_background(
+                open_result_stream, st.session_state.app.db_path, query,
+                st.session_state.app.query_row_limit
+            )
+            st.session_state.app.result_stream = stream
+            rows_returned = len(stream['df']) if stream['df'] is not None else 0
+        elif is_select:
+            result_df = run_query_in_background(execute_read_query, st.session_state.app.connection, query)
+            rows_returned = len(result_df)
+        else:
+            # Anything but a SELECT may write, so it gets its own connection
+            result_df = run_query_in_background(execute_write_query, st.session_state.app.db_path, query)
+            rows_returned = 0
         
         # Add to history
-        rows_returned = len(result_df) if hasattr(result_df, '__len__') else 0
         add_to_query_history(query, success=True, rows_returned=rows_returned)
         
         # Display success message
         st.success("Query executed successfully!")
         
         # Display results if it's a SELECT query
-        if query.strip().upper().startswith('SELECT'):
+        if streamed:
+            render_result_stream()
+        elif is_select:
             if not result_df.empty:
                 st.write(f"**Results ({len(result_df)} rows):**")
                 st.dataframe(result_df, use_container_width=True)
@@ -94,51 +163,280 @@ def execute_sql_query(query: str):
         add_to_query_history(query, success=False, rows_returned=0)
         st.error(f"Query Error: {str(e)}")
 
+def render_result_stream():
+    """
+    Show the rows fetched so far for a streamed SELECT, with a "Load more"
+    button while the cursor may still have rows.
+    """
+    stream = st.session_state.app.result_stream
+    
+    if stream['error']:
+        st.error(f"Query Error: {stream['error']}")
+    
+    if stream['df'] is None:
+        st.info("Query returned 0 rows.")
+        return
+    
+    st.write(f"**Results ({len(stream['df'])} rows):**")
+    st.dataframe(stream['df'], use_container_width=True)
+    
+    if stream['cursor'] is not None:
+        st.caption(f"Showing rows in chunks of {stream['chunksize']} (change this in Settings).")
+        st.button("Load more", on_click=load_more_results, key="sql_load_more")
+
+def open_result_stream(db_path: str, query: str, chunksize: int, running: dict) -> dict:
+    """
+    Start streaming a SELECT and fetch its first chunk (runs on a worker thread).
+    
+    The query gets a read-only connection of its own, so the open cursor
+    doesn't tie up the shared one between reruns. It also means every
+    chunk comes from the same snapshot of the database.
+    
+    Args:
+        db_path (str): Path to the database file
+        query (str): SELECT query to execute
+        chunksize (int): Rows per chunk
+        running (dict): Gets the connection under 'connection' while the query runs
+        
+    Returns:
+        dict: Stream state - the connection, the chunk generator ('cursor',
+        None once it has no more rows), the rows so far ('df') and any error
+    """
+    conn = connect_to_database(db_path, readonly=True)
+    try:
+        with watch_for_cancel(conn, running):
+            chunks = execute_query(conn, query, chunksize=chunksize)
+            first = next(chunks, None)
+    except Exception:
+        conn.close()
+        raise
+    
+    stream = {'conn': conn, 'cursor': chunks, 'chunksize': chunksize, 'df': first, 'error': None}
+    
+    # A short first chunk means there's nothing left to load
+    if first is None or len(first) < chunksize:
+        _finish_stream(stream)
+    return stream
+
+def load_more_results():
+    """
+    Fetch the next chunk of a streamed SELECT ("Load more" callback).
+    """
+    stream = st.session_state.app.result_stream
+    if stream is None or stream['cursor'] is None:
+        return
+    
+    try:
+        chunk = next(stream['cursor'], None)
+    except Exception as e:
+        stream['error'] = str(e)
+        _finish_stream(stream)
+        return
+    
+    if chunk is not None:
+        # Only needed once there's more than one chunk to join
+        import pandas as pd
+        stream['df'] = pd.concat([stream['df'], chunk], ignore_index=True)
+    
+    if chunk is None or len(chunk) < stream['chunksize']:
+        _finish_stream(stream)
+
+def _finish_stream(stream: dict):
+    """
+    Close a stream's cursor and connection, keeping the rows fetched so far.
+    """
+    if stream['cursor'] is not None:
+        stream['cursor'].close()
+        stream['cursor'] = None
+    if stream['conn'] is not None:
+        stream['conn'].close()
+        stream['conn'] = None
+
+def run_query_in_background(task, *args):
+    """
+    Run a query on a worker thread while showing a status box with a Cancel button.
+    
+    Waiting in a loop of Streamlit calls (rather than blocking on the
+    result) lets Streamlit stop this run when the user clicks Cancel or
+    any other widget. The Cancel callback then interrupts the query.
+    
+    Args:
+        task: Function that runs the query. It's called as task(*args, running)
+            and must run its query inside watch_for_cancel(conn, running).
+        *args: Arguments for task
+        
+    Returns:
+        The return value of task
+    """
+    # Holds the connection the query is running on, for the Cancel button
+    running = {}
+    
+    future = _EXEC.submit(task, *args, running)
+    start_time = time.time()
+    
+    with st.status("Running query...") as status:
+        st.button("Cancel", on_click=cancel_running_query, args=(running,), key="cancel_query")
+        
+        try:
+            while not future.done():
+                time.sleep(QUERY_POLL_INTERVAL)
+                status.update(label=f"Running query... ({time.time() - start_time:.1f}s)")
+        except BaseException:
+            # Streamlit stopped this run (another widget was clicked), so the
+            # Cancel button is gone. Stop the query too, or it would hold
+            # a worker thread until it finishes on its own.
+            if not future.cancel() and not future.done():
+                cancel_running_query(running, notify=False)
+            raise
+        
+        try:
+            result = future.result()
+        except Exception:
+            status.update(label="Query failed", state="error")
+            raise
+        
+        status.update(label=f"Query finished in {time.time() - start_time:.2f}s", state="complete")
+    
+    return result
+
+def execute_read_query(conn, query: str, running: dict):
+    """
+    Run a read-only query on the shared connection (runs on a worker thread).
+    
+    Args:
+        conn (sqlite3.Connection): Shared database connection
+        query (str): SQL query to execute
+        running (dict): Gets the connection under 'connection' while the query runs
+        
+    Returns:
+        pd.DataFrame: Query results
+    """
+    with watch_for_cancel(conn, running):
+        return execute_query(conn, query)
+
+def execute_write_query(db_path: str, query: str, running: dict):
+    """
+    Run a query on its own short-lived connection (runs on a worker thread).
+    
+    The connection is opened and closed on the worker, so it stays open
+    for as long as the query runs even if the script run is stopped.
+    
+    Args:
+        db_path (str): Path to the database file
+        query (str): SQL query to execute
+        running (dict): Gets the connection under 'connection' while the query runs
+        
+    Returns:
+        pd.DataFrame: Query results
+    """
+    with write_connection(db_path) as conn:
+        with watch_for_cancel(conn, running):
+            return execute_query(conn, query)
+
+@contextmanager
+def watch_for_cancel(conn, running: dict):
+    """
+    Let Cancel stop the query the with-block runs on conn (on a worker thread).
+    
+    The connection goes into running['connection'], so Cancel can
+    interrupt it. interrupt() does nothing if no statement is running
+    yet, though, so a progress handler also checks running['cancelled']
+    every few thousand SQLite steps. That catches a cancel that arrived
+    before the query started.
+    
+    Args:
+        conn (sqlite3.Connection): Connection the query runs on
+        running (dict): Shared with cancel_running_query
+    """
+    running['connection'] = conn
+    conn.set_progress_handler(lambda: running.get('cancelled', False), QUERY_CANCEL_CHECK_STEPS)
+    try:
+        yield conn
+    finally:
+        # Don't let Cancel interrupt a connection that's done with this query
+        running.pop('connection', None)
+        conn.set_progress_handler(None, 0)
+
+def cancel_running_query(running: dict, notify: bool = True):
+    """
+    Abort the query that is currently running (Cancel button callback).
+    Connection.interrupt() is safe to call from any thread.
+    
+    Args:
+        running (dict): Holds the connection the query is running on
+        notify (bool): Show a "Query cancelled" toast
+    """
+    # Picked up by watch_for_cancel's progress handler, even if the
+    # query hasn't started yet
+    running['cancelled'] = True
+    
+    conn = running.get('connection')
+    if conn:
+        conn.interrupt()
+        if notify:
+            st.toast("Query cancelled")
+
 def render_query_history():
     """
     Render the query history panel.
     """
     st.subheader("Query History")
     
-    if not st.session_state.query_history:
+    if not st.session_state.app.query_history:
         st.info("No query history yet.")
         return
     
     # Display recent queries (most recent first)
-    for i, entry in enumerate(st.session_state.query_history[:10]):  # Show last 10
+    # (deques can't be sliced, so take the first 10 with islice)
+    for i, entry in enumerate(islice(st.session_state.app.query_history, 10)):  # Show last 10
         with st.expander(f"Query {i+1} - {entry['time']}"):
-            # Color code based on success
-            if entry['success']:
-                st.success("Success")
-                if entry['rows_returned'] > 0:
-                    st.caption(f"Rows: {entry['rows_returned']}")
-            else:
-                st.error("Failed")
-            
-            # Show the query
-            st.code(entry['query'], language="sql")
+            # Status and query text come from the cache as one Markdown block
+            st.markdown(render_history_entry(entry))
             
-            # Re-run button
-            if st.button(f"Re-run", key=f"rerun_{i}"):
-                # Store query to text area (will be picked up on next run)
-                st.session_state.sql_text_area = entry['query']
-                st.rerun()
+            # Re-run button - can't be cached since it's interactive.
+            # The callback runs before the text area is created, which is
+            # the only point where its value may be changed.
+            st.button("Re-run", key=f"rerun_{i}", on_click=load_query_into_editor, args=(entry['query'],))
+
+@st.cache_data(ttl=600, max_entries=100, show_spinner=False)
+def render_history_entry(entry: dict) -> str:
+    """
+    Build the Markdown for one query history entry.
+    Cached on the entry itself, so it's only built once per query run
+    instead of on every rerun (e.g. every keystroke in the editor).
+    
+    Args:
+        entry (dict): Query history entry
+        
+    Returns:
+        str: Markdown with the status line and the query in a code block
+    """
+    # Color code based on success
+    if entry['success']:
+        status = ":green[**Success**]"
+        if entry['rows_returned'] > 0:
+            status += f" · Rows: {entry['rows_returned']}"
+    else:
+        status = ":red[**Failed**]"
+    
+    # Use a fence longer than any run of backticks in the query
+    fence = "```"
+    while fence in entry['query']:
+        fence += "`"
+    
+    return f"{status}\n\n{fence}sql\n{entry['query']}\n{fence}"
+
+def load_query_into_editor(query: str):
+    """
+    Put a query into the SQL text area (Re-run button callback).
+    
+    Args:
+        query (str): Query to load
+    """
+    st.session_state.sql_text_area = query
 
 def render_example_queries():
     """
     Render example SQL queries.
     """
-    examples = {
-        "Basic Select": "SELECT * FROM users LIMIT 10;",
-        "Count Rows": "SELECT COUNT(*) FROM products;",
-        "Filter Data": "SELECT * FROM orders WHERE status = 'completed';",
-        "Join Tables": """SELECT u.name, o.order_date, o.total
-FROM users u
-JOIN orders o ON u.id = o.user_id;""",
-        "See Schema": "PRAGMA table_info(users);",
-        "List Tables": "SELECT name FROM sqlite_master WHERE type='table';"
-    }
-    
-    for title, query in examples.items():
-        st.write(f"**{title}:**")
-        st.code(query, language="sql")
\ No newline at end of file
+    st.markdown(EXAMPLE_QUERIES_MARKDOWN)
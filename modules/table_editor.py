@@ -4,9 +4,57 @@ Module for editing table data (CRUD operations).
 We'll keep this simple for now and expand later.
 """
 
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Any, Callable, Optional
 import streamlit as st
-import pandas as pd
-from utils.database import execute_query, get_table_preview
+from utils.database import (
+    insert_rows, bulk_insert, transaction, write_connection, get_table_schema, get_schema_version,
+    get_column_affinity
+)
+from modules.db_explorer import get_preview_page
+
+def _to_text(value: Any) -> str:
+    """
+    Convert a form value for a TEXT column.
+    """
+    return str(value)
+
+def _to_text_or_null(value: Any) -> Any:
+    """
+    Convert a text box value for a NUMERIC or BLOB column.
+    A blank box means NULL (or the DEFAULT, if the column has one), so e.g.
+    an empty date or decimal column isn't filled with ''. Anything else is
+    bound as text and left to the column's affinity: NUMERIC columns turn
+    '12' into 12 the way SQLite does, and BLOB columns keep what was typed.
+    """
+    text = str(value)
+    if not text.strip():
+        return None
+    return text
+
+# Column affinity -> (Python type of the value, widget, converter) for the
+# insert form. NUMERIC and BLOB columns can hold anything, so they get a
+# text box. Converters turn the widget's value into what gets bound.
+AFFINITY_FIELDS = {
+    'INTEGER': (int, 'number', int),
+    'REAL': (float, 'number', float),
+    'TEXT': (str, 'text', _to_text),
+    'NUMERIC': (str, 'text', _to_text_or_null),
+    'BLOB': (str, 'text', _to_text_or_null),
+}
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """
+    How to render one column in the insert form.
+    """
+    name: str                   # Column name
+    py_type: type               # Python type of the widget value (int, float or str)
+    widget: str                 # 'number' or 'text'
+    convert: Callable[[Any], Any]  # Turns the widget value into the value to insert
+    skip: bool                  # True for AUTOINCREMENT keys, which SQLite fills in
+    default: Optional[str] = None  # The column's DEFAULT expression, if it has one
 
 def render_table_editor():
     """
@@ -14,18 +62,18 @@ def render_table_editor():
     """
     st.header("Table Editor")
     
-    if not st.session_state.connection:
+    if not st.session_state.app.connection:
         st.info("Please upload a database file to edit tables.")
         return
     
-    if not st.session_state.tables:
+    if not st.session_state.app.tables:
         st.info("No tables available for editing.")
         return
     
     # Table selection
     selected_table = st.selectbox(
         "Select table to edit:",
-        st.session_state.tables,
+        st.session_state.app.tables,
         key="editor_table_select"
     )
     
@@ -53,69 +101,154 @@ def render_insert_interface(table_name: str):
     """
     st.subheader(f"Insert into {table_name}")
     
-    # Get table schema to know columns
+    # Get the form fields (cached until the schema changes)
     try:
-        schema_df = pd.read_sql_query(
-            f"PRAGMA table_info({table_name})", 
-            st.session_state.connection
-        )
+        conn = st.session_state.app.connection
+        spec = _build_insert_spec(conn, st.session_state.app.db_path, table_name, get_schema_version(conn))
         
-        if schema_df.empty:
+        if not spec:
             st.warning("Cannot get table schema.")
             return
         
+        # Only the columns the user fills in
+        fields = [field for field in spec if not field.skip]
+        
         # Create form for inserting data
         with st.form(key=f"insert_form_{table_name}"):
             inputs = {}
             
-            for _, row in schema_df.iterrows():
-                col_name = row['name']
-                col_type = row['type'].upper()
-                
-                # Skip primary key if it's auto-increment
-                if 'PRIMARY KEY' in str(row['pk']) and 'AUTOINCREMENT' in col_type:
-                    continue
+            for field in fields:
+                # Columns with a DEFAULT start empty - leaving them blank uses it
+                placeholder = f"Default: {field.default}" if field.default is not None else None
                 
-                # Create appropriate input based on column type
-                if 'INT' in col_type:
-                    inputs[col_name] = st.number_input(col_name, step=1)
-                elif 'REAL' in col_type or 'FLOAT' in col_type or 'DOUBLE' in col_type:
-                    inputs[col_name] = st.number_input(col_name, step=0.01)
-                elif 'TEXT' in col_type or 'CHAR' in col_type or 'VARCHAR' in col_type:
-                    inputs[col_name] = st.text_input(col_name)
+                # Otherwise start at the empty value of the column's type (0, 0.0 or "")
+                if field.widget == 'number':
+                    step = 1 if field.py_type is int else 0.01
+                    value = None if field.default is not None else field.py_type()
+                    inputs[field.name] = st.number_input(
+                        field.name, value=value, step=step, placeholder=placeholder
+                    )
                 else:
-                    inputs[col_name] = st.text_input(col_name)
+                    inputs[field.name] = st.text_input(field.name, placeholder=placeholder)
             
-            # Submit button
-            if st.form_submit_button("Insert Row", type="primary"):
-                insert_row(table_name, inputs)
+            # Submit button - rows are collected first and inserted together
+            if st.form_submit_button("Add Row to Batch", type="primary"):
+                row = {}
+                for field in fields:
+                    value = inputs[field.name]
+                    
+                    # Leave blank defaulted columns out, so SQLite fills in the DEFAULT
+                    if field.default is not None and (value is None or not str(value).strip()):
+                        continue
+                    
+                    # Convert each value once, with the converter picked for its column
+                    row[field.name] = field.convert(value)
+                st.session_state.app.pending_rows.setdefault(table_name, []).append(row)
+        
+        render_pending_rows(table_name)
                 
     except Exception as e:
         st.error(f"Error: {str(e)}")
 
-def insert_row(table_name: str, data: dict):
+@st.cache_data(max_entries=32, show_spinner=False)
+def _build_insert_spec(_conn, db_path: str, table_name: str, schema_version: int) -> list:
+    """
+    Work out the insert form fields for a table.
+    Cached on the schema version, so it's only redone after the table
+    definitions change - not on every rerun or insert.
+    
+    Args:
+        _conn: Database connection (not hashed by Streamlit)
+        db_path (str): Path to the database file
+        table_name (str): Name of the table
+        schema_version (int): Schema version, see get_schema_version
+        
+    Returns:
+        list: One FieldSpec per column, in column order
+    """
+    # AUTOINCREMENT can only be used on the INTEGER PRIMARY KEY
+    row = _conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone()
+    autoincrement = bool(row and row[0] and 'AUTOINCREMENT' in row[0].upper())
+    
+    spec = []
+    for cid, name, col_type, notnull, default, pk in get_table_schema(_conn, table_name):
+        affinity = get_column_affinity(col_type)
+        py_type, widget, convert = AFFINITY_FIELDS[affinity]
+        spec.append(FieldSpec(
+            name=name,
+            py_type=py_type,
+            widget=widget,
+            convert=convert,
+            skip=autoincrement and bool(pk) and affinity == 'INTEGER',
+            default=default
+        ))
+    return spec
+
+def render_pending_rows(table_name: str):
+    """
+    Show the rows waiting to be inserted, with buttons to insert or discard them.
+    
+    Args:
+        table_name (str): Name of the table
+    """
+    pending = st.session_state.app.pending_rows.get(table_name, [])
+    if not pending:
+        return
+    
+    st.write(f"**Rows waiting to be inserted: {len(pending)}**")
+    # st.dataframe takes the list of row dicts as is, no DataFrame needed
+    st.dataframe(pending, use_container_width=True)
+    
+    fast_mode = st.toggle(
+        "Fast bulk mode - rebuilds indexes at end",
+        key=f"fast_bulk_{table_name}",
+        help="Drops the table's non-unique indexes while inserting and rebuilds them afterwards. "
+             "Faster for large batches, and nothing changes if the insert fails."
+    )
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button(f"Flush {len(pending)} Row(s)", type="primary", key=f"flush_rows_{table_name}"):
+            flush_pending_rows(table_name, fast_mode)
+    
+    with col2:
+        if st.button("Discard Batch", key=f"discard_rows_{table_name}"):
+            st.session_state.app.pending_rows.pop(table_name, None)
+            st.rerun()
+
+def flush_pending_rows(table_name: str, fast_mode: bool = False):
     """
-    Insert a new row into the table.
+    Insert all rows waiting in the batch for a table, in one transaction.
     
     Args:
         table_name (str): Name of the table
-        data (dict): Column-value pairs to insert
+        fast_mode (bool): Rebuild the table's indexes after inserting
+            instead of updating them row by row (see bulk_insert)
     """
+    pending = st.session_state.app.pending_rows.get(table_name, [])
+    if not pending:
+        return
+    
     try:
-        # Build INSERT query
-        columns = ', '.join(data.keys())
-        values = ', '.join([f"'{v}'" if isinstance(v, str) else str(v) for v in data.values()])
-        
-        query = f"INSERT INTO {table_name} ({columns}) VALUES ({values})"
-        
-        # Execute query
-        execute_query(st.session_state.connection, query)
+        inserted = 0
+        with write_connection(st.session_state.app.db_path, bulk=True) as conn:
+            with bulk_insert(conn, table_name) if fast_mode else transaction(conn):
+                # Rows leave out the defaulted columns that were blank, so
+                # they don't all have the same columns. Each run of rows
+                # with the same columns is sent in one insert_rows call.
+                for columns, rows in groupby(pending, key=tuple):
+                    inserted += insert_rows(conn, table_name, list(columns), rows)
         
-        st.success("Row inserted successfully!")
+        # Only forget the batch once it's safely in the database
+        st.session_state.app.pending_rows.pop(table_name, None)
+        st.toast(f"Inserted {inserted} row(s)")
         st.rerun()  # Refresh to show new data
         
     except Exception as e:
-        st.error(f"Error inserting row: {str(e)}")
+        st.error(f"Error inserting rows: {str(e)}")
 
 def render_update_interface(table_name: str):
     """
@@ -125,12 +258,25 @@ def render_update_interface(table_name: str):
     st.subheader(f"Update rows in {table_name}")
     st.info("Update functionality will be implemented in the next version.")
     
-    # Show current data for reference
+    # Show current data for reference, one page at a time
+    page_size = 20
+    page = st.number_input(
+        "Page:",
+        min_value=1,
+        value=1,
+        step=1,
+        key=f"update_page_{table_name}"
+    )
+    
     try:
-        df = get_table_preview(st.session_state.connection, table_name, limit=20)
-        if not df.empty:
-            st.write("**Current data (first 20 rows):**")
+        # Same keyset paging (and page cursors) as the explorer's Data Preview
+        df = get_preview_page(table_name, int(page), page_size)
+        if df is not None and not df.empty:
+            first_row = (page - 1) * page_size + 1
+            st.write(f"**Current data (rows {first_row} to {first_row + len(df) - 1}):**")
             st.dataframe(df, use_container_width=True)
+        else:
+            st.info("No rows on this page.")
     except:
         pass
 
@@ -7,55 +7,110 @@ Think of it as a dictionary that survives page refreshes.
 
 import streamlit as st
 import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Optional
 
-def init_session_state():
+# AppState fields that are user preferences (changed from Settings)
+PREFERENCE_FIELDS = ('rows_per_page', 'query_row_limit', 'theme', 'auto_run_queries')
+
+@dataclass(slots=True)
+class AppState:
     """
-    Initialize all session state variables.
-    This function should be called at the start of app.py
+    Everything the app keeps between reruns, stored as st.session_state.app.
+    One object set up once is cheaper than checking and looking up a
+    dozen separate session state keys, and typos become errors.
     """
     # Database connection state
-    if 'db_path' not in st.session_state:
-        st.session_state.db_path = None  # Path to current database file
-    if 'connection' not in st.session_state:  # FIXED: was 'connecion'
-        st.session_state.connection = None  # SQLite connection object
-    if 'tables' not in st.session_state:
-        st.session_state.tables = []  # List of table names
+    db_path: Optional[str] = None  # Path to current database file
+    db_filename: Optional[str] = None  # File name shown in the sidebar
+    db_sig: Optional[bytes] = None  # Signature of the last uploaded file
+    connection: Any = None  # SQLite connection object
+    tables: list = field(default_factory=list)  # List of table names
+    table_count: int = 0  # len(tables), kept for the sidebar
+    preview_cursors: dict = field(default_factory=dict)  # Keyset pagination cursors per table
+    pending_rows: dict = field(default_factory=dict)  # Rows waiting to be inserted, per table
     
     # Query history state
-    if 'query_history' not in st.session_state:
-        st.session_state.query_history = []  # List of past queries
+    query_history: deque = field(default_factory=lambda: deque(maxlen=50))  # Past queries, oldest dropped after 50
+    result_stream: Optional[dict] = None  # Streamed SQL Editor result with its open cursor
+    download_file: Optional[str] = None  # Temp file behind the Export tab's download button
     
     # UI state
-    if 'selected_table' not in st.session_state:
-        st.session_state.selected_table = None  # Currently selected table
-    if 'active_tab' not in st.session_state:
-        st.session_state.active_tab = "explorer"  # Current active tab
+    selected_table: Optional[str] = None  # Currently selected table
+    active_tab: str = "explorer"  # Current active tab
     
     # User preferences
-    if 'preferences' not in st.session_state:
-        st.session_state.preferences = {
-            'rows_per_page': 100,
-            'theme': 'light',
-            'auto_run_queries': False
-        }
+    rows_per_page: int = 100
+    query_row_limit: int = 1000
+    theme: str = 'light'
+    auto_run_queries: bool = False
+
+def init_session_state():
+    """
+    Initialize all session state variables.
+    This function should be called at the start of app.py
+    """
+    if 'app' not in st.session_state:
+        st.session_state.app = AppState()
 
 def clear_database_state():
     """
     Clear all database-related session state.
     Called when user wants to load a new database or clear current one.
     """
-    # Close existing connection if it exists
-    if st.session_state.connection:
+    if st.session_state.app.connection:
+        from utils.database import (
+            get_connection, get_read_pool, cached_table_list, cached_table_schema, get_db_mtime
+        )
+        old_path = st.session_state.app.db_path
+        
+        # Drop this database's connections from the session's resource
+        # cache. Streamlit closes them as they are released.
+        get_connection.clear(old_path)
+        get_read_pool.clear(old_path)
+        
+        # Schema results belong to the old database. The connection argument
+        # isn't part of the cache key, so None stands in for it.
+        mtime = get_db_mtime(old_path)
+        cached_table_list.clear(None, old_path, mtime)
+        for table in st.session_state.app.tables:
+            cached_table_schema.clear(None, old_path, mtime, table)
+    
+    # A streamed result reads from the old database
+    close_result_stream()
+    
+    # Prepared downloads are exports of the old database
+    from modules.exporter import discard_download_file
+    discard_download_file()
+    
+    # Reset database state
+    st.session_state.app.db_path = None
+    st.session_state.app.db_filename = None
+    st.session_state.app.connection = None
+    st.session_state.app.tables = []
+    st.session_state.app.table_count = 0
+    st.session_state.app.preview_cursors = {}
+    st.session_state.app.pending_rows = {}
+    st.session_state.app.selected_table = None
+
+def close_result_stream():
+    """
+    Close the SQL Editor's streamed result, if there is one, and forget it.
+    Its cursor keeps a read transaction open, so it shouldn't outlive its use.
+    """
+    stream = st.session_state.app.result_stream
+    if stream is None:
+        return
+    
+    if stream['cursor'] is not None:
+        stream['cursor'].close()
+    if stream['conn'] is not None:
         try:
-            st.session_state.connection.close()
+            stream['conn'].close()
         except:
             pass
-    
-    # Reset database state
-    st.session_state.db_path = None
-    st.session_state.connection = None
-    st.session_state.tables = []
-    st.session_state.selected_table = None
+    st.session_state.app.result_stream = None
 
 def add_to_query_history(query, success=True, rows_returned=0):
     """
@@ -74,12 +129,9 @@ def add_to_query_history(query, success=True, rows_returned=0):
         'time': time.strftime("%H:%M:%S")
     }
     
-    # Add to beginning of list (most recent first)
-    st.session_state.query_history.insert(0, history_entry)
-    
-    # Keep only last 50 queries to prevent memory issues
-    if len(st.session_state.query_history) > 50:
-        st.session_state.query_history = st.session_state.query_history[:50]
+    # Add to the front (most recent first). The deque has maxlen=50, so
+    # the oldest query is dropped automatically to prevent memory issues
+    st.session_state.app.query_history.appendleft(history_entry)
 
 def update_preference(key, value):
     """
@@ -89,7 +141,7 @@ def update_preference(key, value):
         key (str): Preference key (e.g., 'rows_per_page')
         value: New value for the preference
     """
-    if key in st.session_state.preferences:
-        st.session_state.preferences[key] = value
+    if key in PREFERENCE_FIELDS:
+        setattr(st.session_state.app, key, value)
         return True
     return False
\ No newline at end of file
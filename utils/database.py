@@ -4,30 +4,440 @@ Database utility functions for SQLite operations.
 This module handles all direct database interactions.
 """
 
+from __future__ import annotations
+
+import re
 import sqlite3
-import pandas as pd
-from typing import List, Dict, Any, Optional
+import streamlit as st
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 import tempfile
 import os
+import queue
+import urllib.parse
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
+
+# pandas takes a while to import, so functions that return DataFrames
+# import it themselves the first time they run. This import is only for
+# the type hints.
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Optional: APSW wraps SQLite's C API directly, so its executemany has less
+# per-row overhead than sqlite3's. Only used for batch inserts (see
+# write_connection); everything works without it.
+try:
+    import apsw
+except ImportError:
+    apsw = None
+
+# PRAGMAs applied to every connection we open for browsing.
+# Uploaded databases are private temp copies, so WAL + synchronous=NORMAL
+# carries no durability risk for the user's original file.
+READ_PRAGMAS = (
+    "temp_store = MEMORY",      # Sorts and temp tables stay in RAM
+    "cache_size = -131072",     # 128 MB page cache (negative = KiB)
+    "mmap_size = 268435456",    # Memory-map up to 256 MB of the file
+)
+PERFORMANCE_PRAGMAS = (
+    "journal_mode = WAL",       # Readers don't block on writers
+    "synchronous = NORMAL",     # fsync at checkpoints instead of every commit
+) + READ_PRAGMAS
+
+# Column names of the rows returned by get_table_schema (PRAGMA table_info)
+SCHEMA_COLUMNS = ['cid', 'name', 'type', 'notnull', 'dflt_value', 'pk']
+
+# Number of read-only connections kept open per database
+READ_POOL_SIZE = 4
+
+# Rows sent to executemany per call when inserting in bulk
+INSERT_CHUNK_SIZE = 10_000
+
+# Statements execute_query wraps in a BEGIN IMMEDIATE transaction. Others,
+# like VACUUM, ATTACH or BEGIN itself, can't run inside a transaction.
+_TRANSACTION_KEYWORDS = {'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER'}
+
+# Statements that stop _execute_script from wrapping a script in its own
+# transaction: the script manages transactions itself (e.g. sqlite3 .dump
+# output), or the statement can't run inside a transaction
+_SCRIPT_UNWRAPPED_KEYWORDS = {'BEGIN', 'COMMIT', 'END', 'ROLLBACK', 'VACUUM', 'ATTACH', 'DETACH'}
+
+# Number of databases whose table names _known_tables remembers
+KNOWN_TABLES_CACHE_SIZE = 32
+_KNOWN_TABLES_CACHE: Dict[tuple, frozenset] = {}
+
+# Matches index definitions that enforce uniqueness
+_UNIQUE_INDEX_RE = re.compile(r"\s*CREATE\s+UNIQUE\b", re.IGNORECASE)
+
+def quote_identifier(name: str, allowed: Optional[List[str]] = None) -> str:
+    """
+    Quote a table or column name for use in an SQL statement.
+    
+    Names can't be passed as ? parameters, so they have to be put into the
+    SQL text. Double-quoting (with embedded quotes doubled) makes any name
+    safe to use, and checking against a list of known names rejects
+    anything that didn't come from the database itself.
+    
+    Args:
+        name (str): Identifier to quote
+        allowed (Optional[List[str]]): If given, name must be in this list
+        
+    Returns:
+        str: Quoted identifier, e.g. "my table"
+        
+    Raises:
+        ValueError: If name is not in allowed
+    """
+    if allowed is not None and name not in allowed:
+        raise ValueError(f"Unknown table: '{name}'")
+    return '"' + name.replace('"', '""') + '"'
+
+def _safe_ident(name: str, conn: sqlite3.Connection) -> str:
+    """
+    Quote a table name after checking that the table exists in this database.
+    
+    The known names are cached per schema version, which SQLite bumps on
+    every CREATE/DROP/ALTER, so tables created in the SQL editor are
+    picked up without listing the tables on every call.
+    
+    Args:
+        name (str): Table name to check
+        conn (sqlite3.Connection): Database connection the name will be used on
+        
+    Returns:
+        str: Quoted identifier
+        
+    Raises:
+        ValueError: If there is no table with this name
+    """
+    return quote_identifier(name, _known_tables(conn))
+
+def _known_tables(conn: sqlite3.Connection) -> frozenset:
+    """
+    Names of the tables in a database, cached per (file, schema version).
+    Keyed on the file rather than the connection, since write connections
+    are opened fresh for every write.
+    """
+    db_file = get_database_file(conn)
+    key = (db_file, get_schema_version(conn))
+    
+    tables = _KNOWN_TABLES_CACHE.get(key)
+    if tables is None:
+        tables = frozenset(get_table_list(conn))
+        
+        # In-memory databases have no file to key on, and an empty list
+        # may just mean get_table_list failed, so neither is cached
+        if db_file and tables:
+            if len(_KNOWN_TABLES_CACHE) >= KNOWN_TABLES_CACHE_SIZE:
+                # Forget the oldest entry
+                _KNOWN_TABLES_CACHE.pop(next(iter(_KNOWN_TABLES_CACHE)), None)
+            _KNOWN_TABLES_CACHE[key] = tables
+    return tables
+
+def get_database_file(conn: sqlite3.Connection) -> str:
+    """
+    Get the path of the file behind a connection.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        
+    Returns:
+        str: Path of the main database file, or '' for in-memory databases
+    """
+    return next((row[2] for row in conn.execute("PRAGMA database_list") if row[1] == 'main'), '')
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Get the database's schema version.
+    SQLite bumps it on every CREATE/DROP/ALTER, so it works as a cache key
+    for anything derived from the schema.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        
+    Returns:
+        int: Current schema version
+    """
+    return conn.execute("PRAGMA schema_version").fetchone()[0]
 
-def connect_to_database(db_path: str) -> sqlite3.Connection:
+def get_column_affinity(declared_type: str) -> str:
     """
-    Create a connection to a SQLite database.
+    Work out a column's type affinity from its declared type.
+    Follows SQLite's own rules, so e.g. VARCHAR(20) is TEXT and BIGINT is INTEGER.
+    
+    Args:
+        declared_type (str): Type from the column definition (may be empty)
+        
+    Returns:
+        str: One of INTEGER, TEXT, BLOB, REAL or NUMERIC
+    """
+    declared_type = (declared_type or "").upper()
+    
+    # The rules are checked in this order (see "Determination Of Column Affinity")
+    if 'INT' in declared_type:
+        return 'INTEGER'
+    if 'CHAR' in declared_type or 'CLOB' in declared_type or 'TEXT' in declared_type:
+        return 'TEXT'
+    if 'BLOB' in declared_type or not declared_type:
+        return 'BLOB'
+    if 'REAL' in declared_type or 'FLOA' in declared_type or 'DOUB' in declared_type:
+        return 'REAL'
+    return 'NUMERIC'
+
+def connect_to_database(db_path: str, readonly: bool = False) -> sqlite3.Connection:
+    """
+    Create a connection to a SQLite database with the performance PRAGMAs applied.
+    
+    Read-write connections are opened in autocommit mode (isolation_level=None)
+    so transactions are controlled explicitly, and switch the database to WAL.
+    WAL keeps its -wal and -shm files next to the database, so the containing
+    directory must be writable.
+    
+    Read-only connections are opened with a mode=ro URI and skip the WAL
+    setup, since changing the journal mode is a write.
+    
+    Both kinds are opened with check_same_thread=False so background
+    threads can run queries on them.
     
     Args:
         db_path (str): Path to the database file
+        readonly (bool): Open the database read-only
         
     Returns:
         sqlite3.Connection: Database connection object
     """
     try:
-        conn = sqlite3.connect(db_path)
+        if readonly:
+            uri = f"file:{urllib.parse.quote(os.path.abspath(db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            apply_performance_pragmas(conn, READ_PRAGMAS)
+        else:
+            conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            apply_performance_pragmas(conn)
+        
         # Enable foreign key support
         conn.execute("PRAGMA foreign_keys = ON")
         return conn
     except Exception as e:
         raise Exception(f"Failed to connect to database: {str(e)}")
 
+@st.cache_resource(show_spinner=False, on_release=sqlite3.Connection.close, scope="session")
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """
+    Get the session's long-lived connection to a database.
+    
+    Cached with st.cache_resource so the same SQLite handle (and its page
+    cache) survives Streamlit reruns instead of being reopened. Every
+    upload gets its own temp file, so there's nothing to share between
+    sessions: the cache is per session, and Streamlit closes the
+    connection when the entry is cleared or the session ends.
+    
+    Writes don't go through this connection - see write_connection.
+    
+    Args:
+        db_path (str): Path to the database file
+        
+    Returns:
+        sqlite3.Connection: Database connection object
+    """
+    return connect_to_database(db_path)
+
+@contextmanager
+def write_connection(db_path: str, bulk: bool = False):
+    """
+    Open a short-lived connection for one write operation.
+    
+    Writing on a connection of its own means a long INSERT or UPDATE never
+    holds up the shared connection. WAL mode lets the readers carry on
+    while it runs.
+    
+    Args:
+        db_path (str): Path to the database file
+        bulk (bool): The connection is only used for insert_rows/bulk_insert.
+            If APSW is installed, an ApswConnection is returned instead,
+            which inserts faster.
+        
+    Yields:
+        sqlite3.Connection: Read-write database connection, closed afterwards
+    """
+    if bulk and apsw is not None:
+        conn = ApswConnection(db_path)
+    else:
+        conn = connect_to_database(db_path)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+class ApswConnection:
+    """
+    A thin wrapper that makes an APSW connection look like a sqlite3 one.
+    
+    Only covers what the insert helpers use (execute, executemany, cursor,
+    close and in_transaction), so it can be passed to insert_rows,
+    bulk_insert and transaction(). It doesn't return DataFrames, so don't
+    pass it to execute_query.
+    """
+    
+    def __init__(self, db_path: str):
+        try:
+            self._conn = apsw.Connection(db_path)
+            
+            # APSW fails at once on a locked database, sqlite3 waits 5 seconds
+            self._conn.setbusytimeout(5000)
+            
+            # Same settings as connect_to_database's read-write connections
+            apply_performance_pragmas(self)
+            self.execute("PRAGMA foreign_keys = ON")
+        except Exception as e:
+            raise Exception(f"Failed to connect to database: {str(e)}")
+    
+    @property
+    def in_transaction(self) -> bool:
+        # APSW connections are in autocommit mode unless a BEGIN is open
+        return not self._conn.getautocommit()
+    
+    def cursor(self):
+        return self._conn.cursor()
+    
+    def execute(self, sql: str, params=()):
+        return self._conn.cursor().execute(sql, params)
+    
+    def executemany(self, sql: str, seq_of_params):
+        return self._conn.cursor().executemany(sql, seq_of_params)
+    
+    def close(self):
+        self._conn.close()
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """
+    Run a with-block as one explicit transaction.
+    
+    Our connections are in autocommit mode, so without this every
+    statement is committed (and synced to disk) on its own. BEGIN IMMEDIATE
+    takes the write lock up front, so the transaction can't fail halfway
+    because another connection started writing first.
+    
+    If a transaction is already open, the block joins it and the outer
+    transaction decides whether to commit.
+    
+    Args:
+        conn (sqlite3.Connection): Read-write database connection
+        
+    Yields:
+        sqlite3.Connection: The same connection
+    """
+    if conn.in_transaction:
+        yield conn
+        return
+    
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        # SQLite may already have rolled back, e.g. after an interrupt
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+def get_db_mtime(db_path: str) -> float:
+    """
+    Get the modification time of a database file.
+    In WAL mode writes land in the -wal file first, so that counts too.
+    Used as a cache key so results are refreshed after the database changes.
+    
+    Args:
+        db_path (str): Path to the database file
+        
+    Returns:
+        float: Latest modification time, or 0.0 if the file is missing
+    """
+    mtime = 0.0
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            mtime = max(mtime, os.path.getmtime(path))
+        except (OSError, TypeError):
+            pass
+    return mtime
+
+def apply_performance_pragmas(conn: sqlite3.Connection, pragmas: tuple = PERFORMANCE_PRAGMAS) -> None:
+    """
+    Apply performance PRAGMAs to a connection.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        pragmas (tuple): PRAGMA settings to apply (defaults to PERFORMANCE_PRAGMAS)
+    """
+    for pragma in pragmas:
+        conn.execute(f"PRAGMA {pragma}")
+
+class ReadPool:
+    """
+    A small pool of read-only connections to one database.
+    
+    SQLite serializes everything that runs on a single connection, so a big
+    export would hold up the explorer if they shared one. Each pooled
+    connection can run a read at the same time as the others (WAL mode lets
+    readers run alongside the writer). Writes use write_connection.
+    """
+    
+    def __init__(self, db_path: str, size: int = READ_POOL_SIZE):
+        self.db_path = db_path
+        self._connections = queue.Queue()
+        for _ in range(size):
+            self._connections.put(self._connect())
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open one read-only connection.
+        """
+        return connect_to_database(self.db_path, readonly=True)
+    
+    @contextmanager
+    def acquire(self):
+        """
+        Borrow a connection for the duration of a with-block.
+        Blocks until one is free if all connections are in use.
+        
+        Yields:
+            sqlite3.Connection: Read-only database connection
+        """
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+    
+    def close(self):
+        """
+        Close all connections that are currently in the pool.
+        """
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+@st.cache_resource(show_spinner=False, on_release=ReadPool.close, scope="session")
+def get_read_pool(db_path: str) -> ReadPool:
+    """
+    Get the session's read-only connection pool for a database.
+    Cached per session with st.cache_resource so the pool survives reruns.
+    Streamlit closes its connections when the cache entry is cleared or
+    the session ends.
+    
+    Args:
+        db_path (str): Path to the database file
+        
+    Returns:
+        ReadPool: Pool of read-only connections
+    """
+    try:
+        return ReadPool(db_path)
+    except Exception as e:
+        raise Exception(f"Failed to open read connections: {str(e)}")
+
 def get_table_list(conn: sqlite3.Connection) -> List[str]:
     """
     Get list of all tables in the database.
@@ -46,13 +456,13 @@ def get_table_list(conn: sqlite3.Connection) -> List[str]:
         AND name NOT LIKE 'sqlite_%'
         ORDER BY name
         """
-        df = pd.read_sql_query(query, conn)
-        return df['name'].tolist()
+        # Just a column of strings, so there's no need for a DataFrame
+        return [row[0] for row in conn.execute(query)]
     except Exception as e:
         print(f"Error getting table list: {e}")
         return []
 
-def get_table_schema(conn: sqlite3.Connection, table_name: str) -> pd.DataFrame:
+def get_table_schema(conn: sqlite3.Connection, table_name: str) -> List[tuple]:
     """
     Get schema information for a specific table.
     
@@ -61,38 +471,171 @@ def get_table_schema(conn: sqlite3.Connection, table_name: str) -> pd.DataFrame:
         table_name (str): Name of the table
         
     Returns:
-        pd.DataFrame: Schema information including column names, types, etc.
+        List[tuple]: One row per column, laid out as SCHEMA_COLUMNS
+        (cid, name, type, notnull, dflt_value, pk)
     """
     try:
-        query = f"PRAGMA table_info({table_name})"
-        return pd.read_sql_query(query, conn)
+        query = f"PRAGMA table_info({_safe_ident(table_name, conn)})"
+        return conn.execute(query).fetchall()
     except Exception as e:
         raise Exception(f"Error getting schema for table '{table_name}': {str(e)}")
 
-def execute_query(conn: sqlite3.Connection, query: str) -> pd.DataFrame:
+# Cached versions of get_table_list and get_table_schema - Streamlit reruns
+# the whole script on every widget click, and the schema rarely changes.
+# The connection argument starts with an underscore so Streamlit doesn't
+# try to hash it; (db_path, mtime) identifies the database instead.
+
+@st.cache_data(ttl=300, max_entries=32, show_spinner=False)
+def cached_table_list(_conn: sqlite3.Connection, db_path: str, mtime: float) -> List[str]:
+    """
+    Cached version of get_table_list.
+    """
+    return get_table_list(_conn)
+
+@st.cache_data(ttl=300, max_entries=32, show_spinner=False)
+def cached_table_schema(_conn: sqlite3.Connection, db_path: str, mtime: float, table_name: str) -> List[tuple]:
+    """
+    Cached version of get_table_schema.
+    """
+    return get_table_schema(_conn, table_name)
+
+def get_first_keyword(query: str) -> str:
+    """
+    Get the first keyword of a query, skipping whitespace and comments.
+    Only the start of the query is looked at, so this stays cheap even
+    for a large pasted script. /*hint*/ SELECT ... still counts as a SELECT.
+    
+    Args:
+        query (str): SQL query
+        
+    Returns:
+        str: First keyword in upper case (e.g. 'SELECT'), or '' if there is none
+    """
+    i = 0
+    n = len(query)
+    
+    # Skip whitespace, -- line comments and /* block comments */
+    while i < n:
+        if query[i].isspace():
+            i += 1
+        elif query.startswith('--', i):
+            i = query.find('\n', i)
+            if i == -1:
+                return ''
+        elif query.startswith('/*', i):
+            end = query.find('*/', i + 2)
+            if end == -1:
+                return ''
+            i = end + 2
+        else:
+            break
+    
+    # The keyword runs until the first non-letter
+    j = i
+    while j < n and query[j].isalpha():
+        j += 1
+    return query[i:j].upper()
+
+def is_multi_statement(query: str) -> bool:
+    """
+    Check whether a query holds more than one SQL statement.
+    Semicolons inside strings or comments don't count, and neither do
+    trailing semicolons or comments after the last statement.
+    
+    Args:
+        query (str): SQL text
+        
+    Returns:
+        bool: True if another statement follows the first one
+    """
+    # Find the end of the first statement - the first ; that completes it
+    end = query.find(';')
+    while end != -1:
+        if sqlite3.complete_statement(query[:end + 1]):
+            return get_first_keyword(query[end + 1:]) != ''
+        end = query.find(';', end + 1)
+    return False
+
+def get_statement_keywords(script: str) -> List[str]:
+    """
+    Get the first keyword of every statement in a script.
+    Statements are split with sqlite3.complete_statement, so semicolons in
+    strings, comments and trigger bodies don't split them.
+    
+    Args:
+        script (str): SQL statements separated by semicolons
+        
+    Returns:
+        List[str]: First keyword of each statement, in upper case
+    """
+    keywords = []
+    start = 0
+    end = script.find(';')
+    while end != -1:
+        if sqlite3.complete_statement(script[start:end + 1]):
+            keyword = get_first_keyword(script[start:end + 1])
+            if keyword:
+                keywords.append(keyword)
+            start = end + 1
+        end = script.find(';', end + 1)
+    
+    # The last statement doesn't need a semicolon
+    keyword = get_first_keyword(script[start:])
+    if keyword:
+        keywords.append(keyword)
+    return keywords
+
+def execute_query(conn: sqlite3.Connection, query: str, chunksize: Optional[int] = None):
     """
     Execute a SQL query and return results as DataFrame.
     
     Args:
         conn (sqlite3.Connection): Database connection
         query (str): SQL query to execute
+        chunksize (Optional[int]): If given, return a generator of DataFrames
+            with up to this many rows each instead of one DataFrame.
+            Use this for queries that may return a lot of rows.
         
     Returns:
-        pd.DataFrame: Query results
+        pd.DataFrame: Query results (or a generator of DataFrames if chunksize is set)
     """
+    if chunksize:
+        return _iter_query_chunks(conn, query, chunksize)
+    
     try:
-        # Convert query to uppercase to check type
-        query_upper = query.strip().upper()
+        import pandas as pd
+        
+        # cursor.execute only runs one statement, so scripts are run separately
+        if is_multi_statement(query):
+            return _execute_script(conn, query)
         
-        # For SELECT queries, use pandas
-        if query_upper.startswith('SELECT'):
-            return pd.read_sql_query(query, conn)
+        # Check the first keyword only, instead of upper-casing the whole query
+        keyword = get_first_keyword(query)
+        
+        # For SELECT queries, read the rows with the sqlite3 cursor
+        if keyword == 'SELECT':
+            # Build the DataFrame straight from the fetched rows, without
+            # going through pandas' read_sql machinery
+            cursor = conn.execute(query)
+            try:
+                rows = cursor.fetchall()
+                columns = [d[0] for d in cursor.description]
+            finally:
+                cursor.close()
+            
+            df = _rows_to_arrow_frame(rows, columns)
+            if df is not None:
+                return df
+            return pd.DataFrame.from_records(rows, columns=columns)
         
         # For other queries (INSERT, UPDATE, DELETE, CREATE, etc.)
         else:
             cursor = conn.cursor()
-            cursor.execute(query)
-            conn.commit()
+            if keyword in _TRANSACTION_KEYWORDS:
+                with transaction(conn):
+                    cursor.execute(query)
+            else:
+                cursor.execute(query)
             
             # For queries that return rowcount (INSERT, UPDATE, DELETE)
             if cursor.rowcount >= 0:
@@ -108,20 +651,426 @@ def execute_query(conn: sqlite3.Connection, query: str) -> pd.DataFrame:
     except Exception as e:
         raise Exception(f"Error executing query: {str(e)}")
 
-def get_table_preview(conn: sqlite3.Connection, table_name: str, limit: int = 100) -> pd.DataFrame:
+def _execute_script(conn: sqlite3.Connection, script: str) -> pd.DataFrame:
+    """
+    Run several SQL statements as one transaction.
+    
+    executescript commits any open transaction before it starts, so the
+    BEGIN IMMEDIATE goes into the script itself, and COMMIT is run once the
+    script has finished. If a statement fails, everything the script did so
+    far is rolled back.
+    
+    Scripts that manage their own transactions (like sqlite3 .dump output)
+    or contain statements such as VACUUM that can't run in a transaction
+    are run as they are. If such a script leaves its transaction open (e.g.
+    a missing COMMIT), its changes are rolled back and an error is raised.
+    
+    Args:
+        conn (sqlite3.Connection): Read-write database connection
+        script (str): SQL statements separated by semicolons
+        
+    Returns:
+        pd.DataFrame: One-row DataFrame with a message
+    """
+    import pandas as pd
+    
+    keywords = get_statement_keywords(script)
+    wrap = _SCRIPT_UNWRAPPED_KEYWORDS.isdisjoint(keywords)
+    
+    changes_before = conn.total_changes
+    try:
+        conn.executescript(f"BEGIN IMMEDIATE;\n{script}" if wrap else script)
+        
+        # COMMIT isn't appended to the script: an unterminated /* comment
+        # at the end would swallow it
+        if conn.in_transaction:
+            if not wrap:
+                raise Exception("The script left a transaction open (missing COMMIT?), so its changes were rolled back")
+            conn.execute("COMMIT")
+    except Exception:
+        # Also ends a transaction the script itself opened
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    
+    message = f'Script executed successfully. Rows affected: {conn.total_changes - changes_before}'
+    
+    # executescript throws away the rows of any SELECT in the script
+    select_count = sum(keyword in ('SELECT', 'VALUES') for keyword in keywords)
+    if select_count:
+        message += f'. Results of {select_count} SELECT statement(s) are not shown - run them on their own to see them.'
+    
+    return pd.DataFrame({'message': [message]})
+
+def _rows_to_arrow_frame(rows: List[tuple], columns: List[str]) -> Optional[pd.DataFrame]:
+    """
+    Turn fetched rows into an Arrow-backed DataFrame.
+    
+    Each column is converted to an Arrow array in one pass, instead of
+    pandas going through the rows and then copying each column into
+    numpy. st.dataframe can also send the result to the browser
+    without converting it to Arrow again, and integer
+    columns with NULLs stay integers.
+    
+    Args:
+        rows (List[tuple]): Rows from the cursor
+        columns (List[str]): Column names from cursor.description
+        
+    Returns:
+        Optional[pd.DataFrame]: The DataFrame, or None if a column mixes
+        types that Arrow can't hold in one array (SQLite allows that),
+        in which case the caller should fall back
+    """
+    if not rows:
+        return None
+    
+    # pyarrow comes with Streamlit, but only load it once it's needed
+    import pandas as pd
+    import pyarrow as pa
+    
+    try:
+        arrays = [pa.array(values) for values in zip(*rows)]
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    
+    table = pa.Table.from_arrays(arrays, names=columns)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+def insert_rows(conn: sqlite3.Connection, table_name: str, columns: List[str], rows,
+                chunksize: int = INSERT_CHUNK_SIZE) -> int:
+    """
+    Insert many rows into a table in a single transaction.
+    
+    Values are bound as ? parameters and sent with executemany, so SQLite
+    compiles the INSERT once and commits once, instead of once per row.
+    Rows are sent in chunks so a huge iterable is never fully materialized.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        table_name (str): Name of the table
+        columns (List[str]): Columns to fill, in order
+        rows: Iterable of dicts mapping column name to value
+        chunksize (int): Number of rows per executemany call
+        
+    Returns:
+        int: Number of rows inserted
+    """
+    try:
+        sql = _insert_stmt(_safe_ident(table_name, conn), tuple(columns))
+        
+        # itemgetter pulls all the values out of a row dict in one C call.
+        # With a single column it returns the bare value, so wrap it.
+        # With no columns every value comes from its DEFAULT.
+        if not columns:
+            values = (() for row in rows)
+        elif len(columns) == 1:
+            get_values = itemgetter(*columns)
+            values = ((get_values(row),) for row in rows)
+        else:
+            values = map(itemgetter(*columns), rows)
+        inserted = 0
+        
+        # One transaction for all chunks (or the caller's, e.g. bulk_insert's)
+        with transaction(conn):
+            while True:
+                chunk = list(islice(values, chunksize))
+                if not chunk:
+                    break
+                conn.executemany(sql, chunk)
+                inserted += len(chunk)
+        
+        return inserted
+    except Exception as e:
+        raise Exception(f"Error inserting rows into table '{table_name}': {str(e)}")
+
+@lru_cache(maxsize=64)
+def _insert_stmt(table_ident: str, columns: tuple) -> str:
+    """
+    Build the INSERT statement for a table and set of columns.
+    Cached, so repeated inserts into the same table don't rebuild and
+    re-quote the SQL string every time. (executemany prepares it only once
+    per call anyway.)
+    
+    Args:
+        table_ident (str): Already quoted table name (see _safe_ident)
+        columns (tuple): Columns to fill, in order
+        
+    Returns:
+        str: INSERT statement with one ? placeholder per column
+    """
+    if not columns:
+        return f"INSERT INTO {table_ident} DEFAULT VALUES"
+    
+    placeholders = ", ".join("?" * len(columns))
+    column_list = ", ".join(quote_identifier(col) for col in columns)
+    return f"INSERT INTO {table_ident} ({column_list}) VALUES ({placeholders})"
+
+@contextmanager
+def bulk_insert(conn: sqlite3.Connection, table_name: str):
+    """
+    Speed up a large insert by building the table's indexes afterwards.
+    
+    Updating every index for each inserted row is much slower than
+    building the index once over all the rows. So this drops the table's
+    non-unique indexes, lets the with-block insert, then runs the saved
+    CREATE INDEX statements again. UNIQUE indexes (and the automatic ones
+    behind PRIMARY KEY/UNIQUE constraints) are kept, since they enforce
+    constraints while inserting.
+    
+    Everything, including the index changes, happens in one transaction,
+    so if the inserts fail the indexes are restored by the rollback.
+    
+    Args:
+        conn (sqlite3.Connection): Read-write database connection
+        table_name (str): Name of the table being inserted into
+        
+    Example:
+        with bulk_insert(conn, "orders"):
+            insert_rows(conn, "orders", columns, rows)
+    """
+    with transaction(conn):
+        # Automatic indexes have no SQL, so they're left out here
+        indexes = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table_name,)
+        ).fetchall()
+        deferred = [(name, sql) for name, sql in indexes if not _UNIQUE_INDEX_RE.match(sql)]
+        
+        for name, _ in deferred:
+            conn.execute(f"DROP INDEX {quote_identifier(name)}")
+        
+        yield
+        
+        for _, sql in deferred:
+            conn.execute(sql)
+
+def get_row_count(conn: sqlite3.Connection, table_name: str) -> int:
+    """
+    Get the exact number of rows in a table.
+    Note: this scans the whole table, so it can be slow on large tables.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        table_name (str): Name of the table
+        
+    Returns:
+        int: Exact row count
+    """
+    try:
+        cursor = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table_name)}")
+        return cursor.fetchone()[0]
+    except Exception as e:
+        raise Exception(f"Error counting rows in table '{table_name}': {str(e)}")
+
+def get_row_count_estimate(conn: sqlite3.Connection, table_name: str) -> int:
+    """
+    Get a fast, approximate number of rows in a table.
+    
+    Rowid tables use MAX(rowid), which SQLite answers from the B-tree
+    without a scan. Rows are rarely deleted from most tables, so it's close
+    to the real count. WITHOUT ROWID tables have no rowid, so they use the
+    row count stored in sqlite_stat1, running a sampled ANALYZE first if
+    needed.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        table_name (str): Name of the table
+        
+    Returns:
+        int: Approximate row count
+    """
+    try:
+        table = quote_identifier(table_name)
+        
+        try:
+            max_rowid = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0]
+            return max_rowid or 0
+        except sqlite3.OperationalError:
+            # "no such column: rowid" - a WITHOUT ROWID table
+            pass
+        
+        # Otherwise use the statistics table, analyzing the table first if needed
+        row_count = _read_stat1_row_count(conn, table_name)
+        if row_count is None:
+            # Limit ANALYZE to a sample so it stays fast on big tables
+            conn.execute("PRAGMA analysis_limit = 1000")
+            conn.execute(f"ANALYZE {table}")
+            row_count = _read_stat1_row_count(conn, table_name)
+        
+        return row_count or 0
+    except Exception as e:
+        raise Exception(f"Error estimating rows in table '{table_name}': {str(e)}")
+
+def _read_stat1_row_count(conn: sqlite3.Connection, table_name: str) -> Optional[int]:
     """
-    Get a preview of table data.
+    Read a table's row count from sqlite_stat1.
+    The first whitespace-separated token of the stat column is the row count.
+    
+    Returns:
+        Optional[int]: Row count, or None if the table hasn't been analyzed
+    """
+    try:
+        row = conn.execute(
+            "SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table_name,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # sqlite_stat1 doesn't exist until ANALYZE has run once
+        return None
+    
+    if row is None or not row[0]:
+        return None
+    return int(row[0].split()[0])
+
+def get_table_page(conn: sqlite3.Connection, table_name: str, after: Optional[tuple] = None, limit: int = 100):
+    """
+    Get one page of table data using keyset (seek) pagination.
+    
+    Instead of LIMIT/OFFSET, which makes SQLite walk past every skipped row,
+    each page starts right after the last key of the previous page. This keeps
+    every page O(page size) no matter how deep the user pages.
+    Rowid tables are paged by rowid; WITHOUT ROWID tables by their primary key.
     
     Args:
         conn (sqlite3.Connection): Database connection
         table_name (str): Name of the table
-        limit (int): Number of rows to return
+        after (Optional[tuple]): Last key of the previous page (None for the first page)
+        limit (int): Number of rows per page
+        
+    Returns:
+        tuple: (pd.DataFrame with the page data, last key of this page or None if empty)
+    """
+    try:
+        import pandas as pd
+        
+        table = _safe_ident(table_name, conn)
+        key_columns = _get_page_key_columns(conn, table_name)
+        
+        if key_columns is None:
+            # Rowid table - select the rowid under an alias so it can't clash with real columns
+            select = f"SELECT rowid AS _page_key_, * FROM {table}"
+            key_expr = "rowid"
+            order_by = "rowid"
+        else:
+            # WITHOUT ROWID table - compare the primary key as a row value
+            select = f"SELECT * FROM {table}"
+            order_by = ", ".join(quote_identifier(col) for col in key_columns)
+            key_expr = f"({order_by})"
+        
+        if after is None:
+            query = f"{select} ORDER BY {order_by} LIMIT ?"
+            params = (limit,)
+        else:
+            placeholders = ", ".join("?" * len(after))
+            query = f"{select} WHERE {key_expr} > ({placeholders}) ORDER BY {order_by} LIMIT ?"
+            params = tuple(after) + (limit,)
+        
+        # Bound limit and key values, so every page reuses the same prepared statement
+        cursor = conn.execute(query, params)
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+        
+        if not rows:
+            return pd.DataFrame(columns=columns[1:] if key_columns is None else columns), None
+        
+        # The key comes straight from the last fetched row, as plain Python values
+        if key_columns is None:
+            last_key = (rows[-1][0],)
+            rows = [row[1:] for row in rows]
+            columns = columns[1:]
+        else:
+            key_positions = [columns.index(col) for col in key_columns]
+            last_key = tuple(rows[-1][i] for i in key_positions)
+        
+        return pd.DataFrame.from_records(rows, columns=columns), last_key
+    except Exception as e:
+        raise Exception(f"Error getting page for table '{table_name}': {str(e)}")
+
+def _get_page_key_columns(conn: sqlite3.Connection, table_name: str) -> Optional[List[str]]:
+    """
+    Work out which key to page a table by.
+    
+    Returns:
+        Optional[List[str]]: None for rowid tables, otherwise the primary key
+        columns of a WITHOUT ROWID table in key order
+    """
+    table = quote_identifier(table_name)
+    try:
+        conn.execute(f"SELECT rowid FROM {table} LIMIT 0")
+        return None
+    except sqlite3.OperationalError:
+        # WITHOUT ROWID tables have no rowid column
+        pk_columns = [(row[5], row[1]) for row in conn.execute(f"PRAGMA table_info({table})") if row[5]]
+        return [name for _, name in sorted(pk_columns)]
+
+def _iter_query_chunks(conn: sqlite3.Connection, query: str, chunksize: int):
+    """
+    Execute a query and yield the results as DataFrames of up to chunksize rows.
+    Rows are pulled from the cursor with fetchmany, so only one chunk is
+    held in memory at a time - safe for exporting large tables.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        query (str): SQL query to execute
+        chunksize (int): Number of rows per chunk
+        
+    Yields:
+        pd.DataFrame: The next chunk of results
+    """
+    try:
+        import pandas as pd
+        
+        cursor = conn.cursor()
+        cursor.arraysize = chunksize
+        cursor.execute(query)
+        
+        if cursor.description is None:
+            raise Exception("Query does not return any rows")
+        columns = [d[0] for d in cursor.description]
+        
+        try:
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                # Arrow-backed like execute_query's results, so a query gives
+                # the same column types whether it's streamed or not
+                chunk = _rows_to_arrow_frame(rows, columns)
+                yield chunk if chunk is not None else pd.DataFrame.from_records(rows, columns=columns)
+        finally:
+            cursor.close()
+    except Exception as e:
+        raise Exception(f"Error executing query: {str(e)}")
+
+def create_database_snapshot(conn: sqlite3.Connection) -> str:
+    """
+    Write a consistent snapshot of the database to a new temporary file.
+    
+    Uses VACUUM INTO, which copies the database the way SQLite sees it
+    (including anything still in the WAL) and compacts it on the way.
+    Falls back to the backup API on SQLite versions without VACUUM INTO.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
         
     Returns:
-        pd.DataFrame: Table data preview
+        str: Path to the snapshot file. It lives in its own temporary
+        directory, which the caller should remove when done.
     """
+    # VACUUM INTO refuses to overwrite an existing file, so use a fresh directory
+    snapshot_path = os.path.join(tempfile.mkdtemp(), "snapshot.db")
+    
     try:
-        query = f"SELECT * FROM {table_name} LIMIT {limit}"
-        return pd.read_sql_query(query, conn)
+        try:
+            conn.execute("VACUUM INTO ?", (snapshot_path,))
+        except sqlite3.OperationalError:
+            # SQLite < 3.27 - copy page by page with the backup API instead
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+            target = sqlite3.connect(snapshot_path)
+            try:
+                conn.backup(target)
+            finally:
+                target.close()
+        return snapshot_path
     except Exception as e:
-        raise Exception(f"Error getting preview for table '{table_name}': {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error creating database snapshot: {str(e)}")